@@ -0,0 +1,63 @@
+"""
+Measure Commander.exec throughput with and without the fast path.
+Run from the repository root: python benchmarks/fast_exec.py [--number N] [--repeat R]
+"""
+
+import os
+import sys
+import argparse
+import timeit
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pycmds import Commander  # noqa: E402
+from pycmds.core import fast_path_supported  # noqa: E402
+
+
+@click.group()
+@click.option("--top", default=1)
+def root(top):
+    pass
+
+
+@root.group()
+def grp():
+    pass
+
+
+@grp.command()
+@click.argument("xs", nargs=-1)
+@click.option("-v", "--verbose", count=True)
+def leaf(xs, verbose):
+    return len(xs)
+
+
+@root.command()
+@click.option("--n", type=int, required=True)
+def num(n):
+    return n
+
+
+CASES = ["num --n 4", "grp leaf 1 2 -vv"]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--number", type=int, default=5000, help="executions per timing run")
+    arg_parser.add_argument("--repeat", type=int, default=7, help="timing runs per case (the best is reported)")
+    opts = arg_parser.parse_args()
+    if not fast_path_supported():
+        print("warning: the fast path is not supported by this Click version; both columns use main()")
+    print("{:<20} {:>10} {:>10} {:>8}".format("command", "main (us)", "fast (us)", "speedup"))
+    for case in CASES:
+        tokens = case.split()
+        times = []
+        for fast in (False, True):
+            commander = Commander(root, name="bench", fast=fast)
+            best = min(timeit.repeat(lambda: commander.exec(tokens), number=opts.number, repeat=opts.repeat))
+            times.append(best / opts.number * 1e6)
+        print("{:<20} {:>10.1f} {:>10.1f} {:>7.2f}x".format(case, times[0], times[1], times[0] / times[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ Wrapper around Click python library.
 """
 
 
-from .core import AliasGroup, Commander, MutuallyExclusiveOption
+from .core import AliasGroup, Commander, CapturedExec, MutuallyExclusiveOption
 from .completer import CmdCompleter
 from .extratypes import CollectionParamType, ListParamType, DictParamType, VariableParamType, LIST, DICT, VARIABLE
 from .utils import cast
@@ -12,7 +12,7 @@ from .utils import cast
 
 __all__ = [
     # core.py
-    "AliasGroup", "Commander", "MutuallyExclusiveOption",
+    "AliasGroup", "Commander", "CapturedExec", "MutuallyExclusiveOption",
 
     # completer.py
     "CmdCompleter",
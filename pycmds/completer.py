@@ -6,6 +6,10 @@ Prompt-toolkit completer for click commands.
 import sys
 import os
 import shlex
+import math
+import time
+import heapq
+from collections import Counter, OrderedDict
 from prompt_toolkit.completion import Completer, Completion
 import click
 from .core import AliasGroup
@@ -21,23 +25,53 @@ class CmdCompleter(Completer):
         Incompatible with "ignore_unknown_opts" on the Context.
         Incompatible with "chain" on MultiCommands.
         The split character for parameters with nargs>1 is expected to be a space.
+        In fuzzy mode, each command's options, subcommands and fuzzy index are cached by command path (e.g. ("remote",
+        "add")); call reset_fuzzy_indices if options or subcommands are added dynamically.
     """
 
     NONE_USED = object()
+    # The maximum number of command paths to keep fuzzy indices for.
+    MAX_FUZZY_NODES = 256
 
-    def __init__(self, root_cmd, prog_name=None, use_cmd_aliases=True):
+    def __init__(self, root_cmd, prog_name=None, use_cmd_aliases=True, fuzzy=False, fuzzy_time_budget=0.01,
+                 fuzzy_max_results=50, usage_counts=None, usage_weight=0.05):
         """
         :param root_cmd: The root click Command.
         :param prog_name: The program name to show in help message, etc. Defaults to file name from sys.argv.
         :param use_cmd_aliases: Whether to complete command aliases from AliasGroups.
+        :param fuzzy: Whether to complete the current word with fuzzy (subsequence and typo-tolerant) matching instead
+            of exact prefix matching.
+        :param fuzzy_time_budget: The time, in seconds, to spend per completion request in fuzzy mode. When it runs out,
+            the best completions found so far are returned. Building the index for a command the first time it is
+            completed on is not counted.
+        :param fuzzy_max_results: The maximum number of fuzzy completions to return.
+        :param usage_counts: An initial mapping of {<option/command name>: <times used>} used to rank fuzzy completions.
+        :param usage_weight: The maximum boost (relative to a match quality between 0 and 1) usage frequency can give a
+            fuzzy completion. Keep it small so that usage mostly breaks ties between similarly good matches.
         """
         if prog_name is None:
             prog_name = os.path.basename(sys.argv[0])
         self.root_cmd = root_cmd
         self.use_cmd_aliases = use_cmd_aliases
         self.dummy_context = click.Context(root_cmd, info_name=prog_name, **root_cmd.context_settings)
+        self.fuzzy = fuzzy
+        self.fuzzy_time_budget = fuzzy_time_budget
+        self.fuzzy_max_results = fuzzy_max_results
+        self.usage_counts = Counter(usage_counts or {})
+        self.usage_weight = usage_weight
+        # Maps names to the score boost their usage counts give them; kept up to date by record_usage.
+        self.usage_boosts = {name: self.usage_boost(count) for name, count in self.usage_counts.items()}
+        # Maps command paths to (<options>, <subcommand names>, <FuzzyIndex>) tuples in least recently used order. Keyed
+        # by path rather than by command object so that groups which create their commands on demand still reuse them.
+        self.fuzzy_nodes = OrderedDict()
+        # The time.perf_counter value by which the current completion request should finish.
+        self.deadline = 0
+        if fuzzy:
+            # Build the root index up front so the first keystroke doesn't pay for it.
+            self.get_node(root_cmd, ())
 
     def get_completions(self, document, complete_event):
+        self.deadline = time.perf_counter() + self.fuzzy_time_budget
         try:
             # shlex.split splits strings like they would be on the command line.
             words = shlex.split(document.text)
@@ -50,8 +84,8 @@ class CmdCompleter(Completer):
             else ""
         # Some state variables:
         curr_cmd = self.root_cmd
-        curr_options = self.get_options(curr_cmd)
-        curr_subcmds = self.get_subcommand_names(curr_cmd)
+        curr_path = ()
+        curr_options, curr_subcmds, curr_index = self.get_node(curr_cmd, curr_path)
         curr_used_options = set()
         # complete_more_short is a state variable set to indicate if we should complete more single dash options on the
         # current word if it is a group of short options. If the last option in the group is a flag, then we may;
@@ -59,11 +93,16 @@ class CmdCompleter(Completer):
         complete_more_short = None
         # Added to as need to indicate how many words (which are assumed to be values) to skip.
         n_vals_needed = 0
+        # Set if the current word is a complete subcommand name which has already been descended into.
+        curr_word_is_subcmd = False
+        # Set if the current word is a value for the preceding option.
+        curr_word_is_value = False
         # Loop through each word and classify it.
-        for word in words:
+        for idx, word in enumerate(words):
             # Skip words if needed.
             if n_vals_needed:
                 n_vals_needed -= 1
+                curr_word_is_value = idx == len(words) - 1 and word == curr_word
                 continue
             # Parse long options.
             if word.startswith("--"):
@@ -81,9 +120,10 @@ class CmdCompleter(Completer):
                     return []
                 curr_used_options.update(used)
             elif word in curr_subcmds:
+                curr_word_is_subcmd = idx == len(words) - 1 and word == curr_word
                 curr_cmd = curr_cmd.get_command(self.dummy_context, word)
-                curr_options = self.get_options(curr_cmd)
-                curr_subcmds = self.get_subcommand_names(curr_cmd)
+                curr_path += (word,)
+                curr_options, curr_subcmds, curr_index = self.get_node(curr_cmd, curr_path)
                 curr_used_options = set()
             # If this word is not an option or subcommand and its not the current (i.e. still being edited) word, it
             # ought to be an argument, which we can't auto-complete for.
@@ -92,6 +132,9 @@ class CmdCompleter(Completer):
         # If we ended the above loop still looking for values, we can't auto-complete.
         if n_vals_needed:
             return []
+        # Nor can we complete a value, whether it is a separate word or attached to its option with "=".
+        if curr_word_is_value or "=" in curr_word:
+            return []
         # Establish a list of option names that may still be used (and thus should be shown in the completion menu).
         option_completions = [k for k, v in curr_options.items()
                               if v in set(curr_options.values()).difference(curr_used_options)]
@@ -101,10 +144,65 @@ class CmdCompleter(Completer):
                 return self.filter_and_format_short_flags(option_completions)
             # Otherwise we don't complete anything.
             return []
+        # In fuzzy mode, rank every candidate against the current word (an empty word matches everything equally, so
+        # fall through to the plain listing in that case). Skip fuzzy matching if the current word is a complete
+        # subcommand (the candidates are then its children, not alternatives to it) or if it was quoted or escaped (the
+        # span to replace in the raw text is then not simply the word's length.)
+        if self.fuzzy and curr_word and not curr_word_is_subcmd and self.is_raw_word(document.text, curr_word):
+            return self.filter_and_format_fuzzy(curr_index, curr_word, set(curr_options).difference(option_completions))
         # If the current word isn't a group of short options, complete simply based on what each candidate (all option
         # names and subcommands for the right-most identified command in the document text) starts with.
         return self.filter_and_format_startswith(option_completions + curr_subcmds, curr_word)
 
+    def record_usage(self, name, count=1):
+        """
+        Record that the given option or command name was used so that fuzzy completion ranks it higher in the future.
+        :param name: The option or command name (e.g. "--verbose" or "install").
+        :param count: How many uses to record.
+        """
+        self.usage_counts[name] += count
+        self.usage_boosts[name] = self.usage_boost(self.usage_counts[name])
+
+    def reset_fuzzy_indices(self):
+        """
+        Discard all cached fuzzy indices so they are rebuilt on the next completion request.
+        """
+        self.fuzzy_nodes.clear()
+
+    def get_node(self, cmd, path):
+        """
+        Get the options, subcommand names and (in fuzzy mode) fuzzy index of the given command.
+        :param cmd: The click Command.
+        :param path: The tuple of subcommand names leading to cmd from the root command.
+        :return: A tuple of (<dict of option names to options>, <list of subcommand names>, <FuzzyIndex or None>).
+        """
+        if not self.fuzzy:
+            return self.get_options(cmd), self.get_subcommand_names(cmd), None
+        try:
+            self.fuzzy_nodes.move_to_end(path)
+            return self.fuzzy_nodes[path]
+        except KeyError:
+            start = time.perf_counter()
+            options = self.get_options(cmd)
+            subcmds = self.get_subcommand_names(cmd)
+            node = options, subcmds, FuzzyIndex(list(options) + subcmds)
+            self.fuzzy_nodes[path] = node
+            if len(self.fuzzy_nodes) > self.MAX_FUZZY_NODES:
+                self.fuzzy_nodes.popitem(last=False)
+            # One-time index builds don't count against the per-request time budget.
+            self.deadline += time.perf_counter() - start
+            return node
+
+    def filter_and_format_fuzzy(self, index, query, exclude):
+        matches = index.search(query, exclude, self.deadline, self.fuzzy_max_results, self.usage_boosts)
+        # Fuzzy matches need not share a prefix with the current word, so replace the whole word.
+        start_position = -len(query)
+        return [Completion(string, start_position=start_position) for string in matches]
+
+    def usage_boost(self, count):
+        # Saturates below usage_weight so that usage can't outweigh large differences in match quality.
+        return self.usage_weight * (1 - 1 / (1 + math.log1p(count)))
+
     def get_subcommand_names(self, cmd):
         # Commands only have subcommands if they're MultiCommands
         if isinstance(cmd, click.MultiCommand):
@@ -176,6 +274,11 @@ class CmdCompleter(Completer):
             break
         return used_params, n_vals_needed, complete_more_short
 
+    @staticmethod
+    def is_raw_word(text, word):
+        # Whether the text ends with the given word exactly as typed, i.e. without quotes or escapes.
+        return text.endswith(word) and (len(text) == len(word) or text[-len(word) - 1].isspace())
+
     @staticmethod
     def is_short_flag(flag):
         return flag.startswith("-") and not flag.startswith("--")
@@ -188,3 +291,121 @@ class CmdCompleter(Completer):
             if string.startswith(prefix):
                 ret.append(Completion(string[prefix_len:]))
         return ret
+
+
+class FuzzyIndex:
+    """
+    A precomputed index of completion candidates for fuzzy matching.
+    Each candidate is stored with a character bitmap (for cheaply rejecting candidates which cannot contain the query
+    as a subsequence) and a set of character bigrams (for tolerating typos such as transposed or substituted
+    characters.) Matching is case-insensitive.
+    """
+
+    # Check the deadline every this many candidates; time.perf_counter is cheap but not free.
+    CHECK_INTERVAL = 64
+    # Minimum bigram similarity (Dice coefficient) for a candidate that is not a subsequence match to be accepted.
+    MIN_SIMILARITY = 0.4
+
+    def __init__(self, candidates):
+        """
+        :param candidates: An iterable of candidate strings.
+        """
+        # Candidates starting with a dash (options) are only matched against queries starting with one, and vice versa.
+        self.dashed_entries = []
+        self.plain_entries = []
+        for candidate in candidates:
+            folded = candidate.lower()
+            entries = self.dashed_entries if candidate.startswith("-") else self.plain_entries
+            entries.append((candidate, folded, self.char_bitmap(folded), self.bigrams(folded)))
+
+    def search(self, query, exclude=(), deadline=None, limit=None, boosts=None):
+        """
+        Find the best candidates matching the given query.
+        Only options (candidates starting with a dash) are matched if the query starts with a dash; otherwise only
+        other candidates are. Subsequence matches are found first and always rank above typo-tolerant (bigram) matches.
+        Ranking happens while searching, so if the deadline passes, the best matches found so far are returned at once.
+        :param query: The (partial) word to match.
+        :param exclude: A collection of candidates to ignore.
+        :param deadline: A time.perf_counter value after which to stop searching, or None for no limit.
+        :param limit: The maximum number of matches to return, or None for no limit.
+        :param boosts: A dictionary of {<candidate>: <score boost>} added to match qualities, which are in the range
+            (0.5, 1] for subsequence matches and (0, 0.5) for typo-tolerant matches.
+        :return: A list of matching candidates, best first.
+        """
+        folded = query.lower()
+        query_bitmap = self.char_bitmap(folded)
+        boosts = boosts or {}
+        # A min-heap of (<tier>, <score>, <negated position>, <candidate>) holding the best matches so far. The negated
+        # position makes earlier candidates win ties.
+        heap = []
+
+        def offer(tier, quality, idx, candidate):
+            match = (tier, quality + boosts.get(candidate, 0), -idx, candidate)
+            if limit is None or len(heap) < limit:
+                heapq.heappush(heap, match)
+            elif match > heap[0]:
+                heapq.heapreplace(heap, match)
+
+        def ranked():
+            return [match[3] for match in sorted(heap, reverse=True)]
+
+        # Candidates which fail the subsequence test are kept for the second (slower) pass.
+        rest = []
+        entries = self.dashed_entries if query.startswith("-") else self.plain_entries
+        for idx, (candidate, cand_folded, cand_bitmap, cand_bigrams) in enumerate(entries):
+            if deadline is not None and not idx % self.CHECK_INTERVAL and time.perf_counter() > deadline:
+                return ranked()
+            if candidate in exclude:
+                continue
+            quality = None
+            if query_bitmap & cand_bitmap == query_bitmap:
+                quality = self.subsequence_quality(folded, cand_folded)
+            if quality is None:
+                rest.append((idx, candidate, cand_bigrams))
+            else:
+                offer(1, quality, idx, candidate)
+        query_bigrams = self.bigrams(folded)
+        if not query_bigrams:
+            return ranked()
+        for n, (idx, candidate, cand_bigrams) in enumerate(rest):
+            if deadline is not None and not n % self.CHECK_INTERVAL and time.perf_counter() > deadline:
+                break
+            if not cand_bigrams:
+                continue
+            similarity = 2 * len(query_bigrams & cand_bigrams) / (len(query_bigrams) + len(cand_bigrams))
+            if similarity >= self.MIN_SIMILARITY:
+                offer(0, 0.5 * similarity, idx, candidate)
+        return ranked()
+
+    @staticmethod
+    def subsequence_quality(query, candidate):
+        """
+        Score how well the query matches the candidate as a subsequence.
+        :return: None if the query is not a subsequence of the candidate, otherwise a quality in the range (0.5, 1],
+            rewarding consecutive and word-boundary matches and short candidates.
+        """
+        prev = -1
+        bonus = 0
+        for char in query:
+            idx = candidate.find(char, prev + 1)
+            if idx == -1:
+                return None
+            if idx == prev + 1 or candidate[idx - 1] in "-_":
+                # Consecutive characters, or the first character of a hyphen- or underscore-separated word.
+                bonus += 1
+            prev = idx
+        return 0.5 + 0.3 * bonus / len(query) + 0.2 * len(query) / len(candidate)
+
+    @staticmethod
+    def char_bitmap(string):
+        # Characters outside the ASCII range may collide, which only lets extra candidates through to the exact test.
+        bitmap = 0
+        for char in string:
+            bitmap |= 1 << (ord(char) & 127)
+        return bitmap
+
+    @staticmethod
+    def bigrams(string):
+        # Leading dashes are shared by every option name and would make all options look alike.
+        string = string.lstrip("-")
+        return {string[i:i+2] for i in range(len(string) - 1)}
@@ -4,8 +4,14 @@ Core functionality/Click addons.
 """
 
 import shlex
+import importlib.metadata
+from collections import namedtuple
+from functools import lru_cache
 import click
-from .utils import DotDict
+from .utils import DotDict, CaptureBuffer, NullBuffer, redirect_thread_output
+
+
+CapturedExec = namedtuple("CapturedExec", ["result", "stdout", "stderr"])
 
 
 class Commander:
@@ -14,7 +20,7 @@ class Commander:
     """
 
     def __init__(self, root_cmd, name=None, obj=None, print_click_exceptions=True,
-                 suppress_aborts=False, suppress_exits=True):
+                 suppress_aborts=False, suppress_exits=True, fast=False):
         """
         :param root_cmd: The root Click command object.
         :param name: The program name
@@ -22,6 +28,8 @@ class Commander:
         :param print_click_exceptions: Whether to print Click exceptions when they occur or simply reraise them.
         :param suppress_aborts: Whether to suppress Abort exceptions or reraise them.
         :param suppress_exits: Whether to suppress SystemExit exceptions or reraise them.
+        :param fast: Whether to execute commands through a fast path which reuses a prepared parser and parameter list
+            for each command instead of rebuilding them on every execution (see fast_main.)
         """
         self.root_cmd = root_cmd
         self.name = name
@@ -29,6 +37,9 @@ class Commander:
         self.print_click_exceptions = print_click_exceptions
         self.suppress_aborts = suppress_aborts
         self.suppress_exits = suppress_exits
+        self.fast = fast
+        # Created on the first fast execution.
+        self.fast_executor = None
 
     def exec(self, cmd, **ctx_settings):
         """
@@ -45,6 +56,8 @@ class Commander:
                     cmd = shlex.split(cmd)
                 except ValueError as e:
                     raise click.UsageError(str(e)) from e
+            if self.fast:
+                return self.fast_main(cmd, obj=self.obj, **ctx_settings)
             return self.root_cmd.main(args=cmd, prog_name=self.name, standalone_mode=False,
                                       obj=self.obj, **ctx_settings)
         except SystemExit:
@@ -61,6 +74,73 @@ class Commander:
             elif not self.suppress_aborts:
                 raise
 
+    def exec_captured(self, cmd, discard_output=False, **ctx_settings):
+        """
+        Execute the given command like exec, but capture its standard output and error in memory instead of writing
+        them to the real streams. Only output from the calling thread is captured, so concurrent executions from
+        different threads are kept separate.
+        :param cmd: Command to execute as a string or list of tokens.
+        :param discard_output: Whether to throw away the output instead of keeping it.
+        :param ctx_settings: Additional context settings.
+        :return: A CapturedExec named tuple of the command's result and its captured stdout and stderr strings (which
+            are empty if discard_output is set.) If the command raises, the output captured so far is attached to the
+            exception as a CapturedExec (with a result of None) in its "captured" attribute.
+        """
+        if discard_output:
+            stdout, stderr = NullBuffer(), NullBuffer()
+        else:
+            stdout, stderr = CaptureBuffer(), CaptureBuffer()
+        try:
+            with redirect_thread_output(stdout, stderr):
+                result = self.exec(cmd, **ctx_settings)
+        except BaseException as e:
+            e.captured = CapturedExec(None, stdout.getvalue(), stderr.getvalue())
+            raise
+        return CapturedExec(result, stdout.getvalue(), stderr.getvalue())
+
+    def fast_main(self, args, **extra):
+        """
+        Equivalent to self.root_cmd.main(args, prog_name=self.name, standalone_mode=False, **extra), but faster for
+        repeated executions:
+            The program name is detected once rather than on every call.
+            Shell completion environment variables are not checked.
+            (As with main, which only expands sys.argv, arguments are never glob/user/env expanded on Windows.)
+            Each command's parser and parameter list are prepared once and reused (see clear_parser_cache.)
+        Commands which override make_context, parse_args, make_parser, get_params or (for groups) invoke, or which have
+        parameters overriding add_to_parser, are executed through their own methods as usual. The fast path relies on
+        Click internals, so on Click versions other than 8.0 and 8.1 this simply calls main.
+        :param args: List of command tokens.
+        :param extra: Extra keyword arguments for the root context.
+        :return: The result of the command.
+        """
+        if self.fast_executor is None:
+            if not fast_path_supported():
+                return self.root_cmd.main(args=args, prog_name=self.name, standalone_mode=False, **extra)
+            # Imported here so the default path doesn't depend on (or warn about) Click internals.
+            from .fastexec import FastExecutor
+            self.fast_executor = FastExecutor(self.root_cmd, self.name)
+        return self.fast_executor.main(args, **extra)
+
+    def clear_parser_cache(self):
+        """
+        Discard all parsers prepared by the fast path. Call this after adding parameters to commands which have already
+        been executed.
+        """
+        if self.fast_executor is not None:
+            self.fast_executor.clear_cache()
+
+
+@lru_cache(maxsize=None)
+def fast_path_supported():
+    """
+    Check whether the installed Click version is one the Commander fast path was written against (8.0 or 8.1).
+    """
+    try:
+        version = importlib.metadata.version("click")
+    except importlib.metadata.PackageNotFoundError:
+        return False
+    return version.split(".")[:2] in (["8", "0"], ["8", "1"])
+
 
 class AliasGroup(click.Group):
     """
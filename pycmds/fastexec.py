@@ -0,0 +1,191 @@
+"""
+Fast execution path for Commander (Click 8.0/8.1 only; see Commander.fast_main).
+"""
+
+import sys
+import copy
+import errno
+import threading
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from gettext import gettext as _, ngettext
+import click
+from click.core import iter_params_for_processing
+from click.parser import OptionParser
+from click.utils import PacifyFlushWrapper, _detect_program_name
+
+
+class FastExecutor:
+    """
+    Executes Click commands like BaseCommand.main with standalone_mode=False, but reuses a prepared parser and parameter
+    list for each command instead of rebuilding them on every execution.
+    """
+
+    # The maximum number of parsers (for different help option names and token normalize functions) kept per command.
+    MAX_PARSERS_PER_COMMAND = 8
+
+    def __init__(self, root_cmd, prog_name=None):
+        """
+        :param root_cmd: The root Click command object.
+        :param prog_name: The program name. Detected the same way as Click does if not given.
+        """
+        self.root_cmd = root_cmd
+        self.prog_name = prog_name if prog_name is not None else _detect_program_name()
+        # Maps each command to an OrderedDict (in least recently used order) of (<help option names>, <token normalize
+        # function>) to a prepared (<OptionParser>, <params>) tuple. Weakly keyed so that commands created on demand by
+        # lazily loading groups are freed along with their parsers.
+        self.parser_cache = weakref.WeakKeyDictionary()
+        self.parser_cache_lock = threading.Lock()
+
+    def main(self, args, **extra):
+        """
+        Execute the root command with the given arguments.
+        :param args: List of command tokens.
+        :param extra: Extra keyword arguments for the root context.
+        :return: The result of the command.
+        """
+        try:
+            try:
+                with self._make_context(self.root_cmd, self.prog_name, list(args), **extra) as ctx:
+                    return self._invoke(ctx)
+            except (EOFError, KeyboardInterrupt) as e:
+                click.echo(file=sys.stderr)
+                raise click.Abort() from e
+            except OSError as e:
+                if e.errno == errno.EPIPE:
+                    sys.stdout = PacifyFlushWrapper(sys.stdout)
+                    sys.stderr = PacifyFlushWrapper(sys.stderr)
+                    sys.exit(1)
+                raise
+        except click.exceptions.Exit as e:
+            return e.exit_code
+
+    def clear_cache(self):
+        """
+        Discard all prepared parsers.
+        """
+        with self.parser_cache_lock:
+            self.parser_cache.clear()
+
+    def _make_context(self, cmd, info_name, args, parent=None, **extra):
+        # Equivalent of cmd.make_context.
+        if not has_default_parsing(type(cmd)):
+            return cmd.make_context(info_name, args, parent=parent, **extra)
+        for key, value in cmd.context_settings.items():
+            if key not in extra:
+                extra[key] = value
+        ctx = cmd.context_class(cmd, info_name=info_name, parent=parent, **extra)
+        with ctx.scope(cleanup=False):
+            self._parse_args(cmd, ctx, args)
+        return ctx
+
+    def _parse_args(self, cmd, ctx, args):
+        # Equivalent of cmd.parse_args.
+        if not args and cmd.no_args_is_help and not ctx.resilient_parsing:
+            click.echo(ctx.get_help(), color=ctx.color)
+            ctx.exit()
+        parser, params = self._get_parser(cmd, ctx)
+        opts, args, param_order = parser.parse_args(args=args)
+        for param in iter_params_for_processing(param_order, params):
+            value, args = param.handle_parse_result(ctx, opts, args)
+        if args and not ctx.allow_extra_args and not ctx.resilient_parsing:
+            ctx.fail(ngettext("Got unexpected extra argument ({args})",
+                              "Got unexpected extra arguments ({args})",
+                              len(args)).format(args=" ".join(map(str, args))))
+        ctx.args = args
+        ctx._opt_prefixes.update(parser._opt_prefixes)
+        if isinstance(cmd, click.MultiCommand):
+            if cmd.chain:
+                ctx.protected_args = args
+                ctx.args = []
+            elif args:
+                ctx.protected_args, ctx.args = args[:1], args[1:]
+        return ctx.args
+
+    def _get_parser(self, cmd, ctx):
+        # Get a parser bound to ctx and the parameter list for the given command, preparing and caching them if
+        # necessary. The help option depends on the context's help option names and option names are normalized with
+        # its token normalize function when added to the parser, so both are part of the key.
+        key = (tuple(ctx.help_option_names), ctx.token_normalize_func)
+        with self.parser_cache_lock:
+            parsers = self.parser_cache.get(cmd)
+            cached = parsers.get(key) if parsers is not None else None
+            if cached is not None:
+                parsers.move_to_end(key)
+        if cached is not None:
+            prepared, params = cached
+        else:
+            params = cmd.get_params(ctx)
+            prepared = OptionParser(ctx)
+            for param in params:
+                param.add_to_parser(prepared, ctx)
+            # Parameters which customize add_to_parser might depend on the context, so only cache stock ones.
+            if not all(has_default_add_to_parser(type(param)) for param in params):
+                return prepared, params
+            # Don't hold onto the context.
+            prepared.ctx = None
+            with self.parser_cache_lock:
+                parsers = self.parser_cache.setdefault(cmd, OrderedDict())
+                parsers[key] = prepared, params
+                if len(parsers) > self.MAX_PARSERS_PER_COMMAND:
+                    parsers.popitem(last=False)
+        # Parsing never modifies the parser itself, so a shallow copy (sharing the option tables) is enough to bind
+        # this execution's context without interfering with concurrent executions.
+        parser = copy.copy(prepared)
+        parser.ctx = ctx
+        parser.allow_interspersed_args = ctx.allow_interspersed_args
+        parser.ignore_unknown_options = ctx.ignore_unknown_options
+        return parser, params
+
+    def _invoke(self, ctx):
+        # Equivalent of ctx.command.invoke. Subcommand contexts of non-chained groups are made through the fast path;
+        # anything else is invoked normally.
+        cmd = ctx.command
+        if not (isinstance(cmd, click.MultiCommand) and not cmd.chain and has_default_parsing(type(cmd))
+                and type(cmd).invoke is click.MultiCommand.invoke):
+            return cmd.invoke(ctx)
+
+        def process_result(value):
+            if cmd._result_callback is not None:
+                value = ctx.invoke(cmd._result_callback, value, **ctx.params)
+            return value
+
+        if not ctx.protected_args:
+            if cmd.invoke_without_command:
+                with ctx:
+                    return process_result(click.Command.invoke(cmd, ctx))
+            ctx.fail(_("Missing command."))
+        args = [*ctx.protected_args, *ctx.args]
+        ctx.args = []
+        ctx.protected_args = []
+        with ctx:
+            cmd_name, sub_cmd, args = cmd.resolve_command(ctx, args)
+            ctx.invoked_subcommand = cmd_name
+            click.Command.invoke(cmd, ctx)
+            sub_ctx = self._make_context(sub_cmd, cmd_name, args, parent=ctx)
+            with sub_ctx:
+                return process_result(self._invoke(sub_ctx))
+
+
+@lru_cache(maxsize=None)
+def has_default_parsing(cmd_type):
+    """
+    Check whether the given Command class parses its arguments with Click's stock methods, in which case the fast path
+    may stand in for them.
+    :param cmd_type: A click.Command subclass.
+    """
+    if not issubclass(cmd_type, click.Command):
+        return False
+    parse_args = click.MultiCommand.parse_args if issubclass(cmd_type, click.MultiCommand) else click.Command.parse_args
+    return (cmd_type.make_context is click.BaseCommand.make_context and cmd_type.parse_args is parse_args
+            and cmd_type.make_parser is click.Command.make_parser and cmd_type.get_params is click.Command.get_params)
+
+
+@lru_cache(maxsize=None)
+def has_default_add_to_parser(param_type):
+    """
+    Check whether the given Parameter class adds itself to parsers with Click's stock method.
+    :param param_type: A click.Parameter subclass.
+    """
+    return param_type.add_to_parser in (click.Option.add_to_parser, click.Argument.add_to_parser)
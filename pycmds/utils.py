@@ -3,6 +3,11 @@
 Miscellaneous utility classes/functions.
 """
 
+import sys
+import threading
+import contextlib
+import click
+
 
 class DotDict(dict):
     """
@@ -131,3 +136,159 @@ def cast(**casts):
             func(*args, **kwargs)
         return inner
     return outer
+
+
+class CaptureBuffer:
+    """
+    An in-memory text buffer for captured output.
+    Writes are appended to a list of chunks which is joined once in getvalue, so frequent small writes never copy
+    previously written output (unlike growing a single string buffer.)
+    """
+
+    encoding = "utf-8"
+    errors = "strict"
+
+    def __init__(self):
+        self.chunks = []
+        # Click writes bytes messages to the binary buffer of a text stream.
+        self.buffer = CaptureBinaryWriter(self)
+
+    def write(self, s):
+        # Reject bytes like a real text stream does; Click probes streams this way to tell text from binary.
+        if not isinstance(s, str):
+            raise TypeError("write() argument must be str, not {}".format(type(s).__name__))
+        self.append(s)
+        return len(s)
+
+    def append(self, s):
+        self.chunks.append(s)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    def getvalue(self):
+        """
+        :return: Everything written to this buffer as a single string.
+        """
+        value = "".join(self.chunks)
+        # Keep the joined string so repeated calls don't join again.
+        self.chunks = [value] if value else []
+        return value
+
+
+class NullBuffer(CaptureBuffer):
+    """
+    A capture buffer which discards everything written to it.
+    """
+
+    def append(self, s):
+        pass
+
+
+class CaptureBinaryWriter:
+    """
+    The binary side of a CaptureBuffer; bytes written here are decoded as UTF-8 into the text buffer.
+    """
+
+    def __init__(self, text_buffer):
+        self.text_buffer = text_buffer
+
+    def write(self, b):
+        if not isinstance(b, (bytes, bytearray)):
+            raise TypeError("a bytes-like object is required, not {!r}".format(type(b).__name__))
+        self.text_buffer.append(b.decode("utf-8", "replace"))
+        return len(b)
+
+    def flush(self):
+        pass
+
+
+class ThreadLocalStream:
+    """
+    A stream proxy which writes to a per-thread target stream when one is set, and otherwise to a fallback stream.
+    Installing one of these as sys.stdout/sys.stderr lets each thread redirect its own output without affecting others.
+    """
+
+    def __init__(self, fallback):
+        """
+        :param fallback: The stream to write to in threads without a target. It should be a correctly configured text
+            stream (see install_thread_local_stream) since Click caches how it wraps the proxy, regardless of target.
+        """
+        self.fallback = fallback
+        self.local = threading.local()
+
+    @property
+    def target(self):
+        target = getattr(self.local, "target", None)
+        return self.fallback if target is None else target
+
+    @property
+    def encoding(self):
+        return self.target.encoding
+
+    @property
+    def errors(self):
+        return self.target.errors
+
+    def write(self, s):
+        target = self.target
+        # The original stream may be None (e.g. under pythonw), in which case output is silently dropped as it would
+        # have been by Click.
+        if target is None:
+            return len(s)
+        return target.write(s)
+
+    def flush(self):
+        target = self.target
+        if target is not None:
+            target.flush()
+
+    def __getattr__(self, item):
+        # Delegate everything else (isatty, fileno, buffer, etc.) to whichever stream is currently in use.
+        return getattr(self.target, item)
+
+
+_stream_install_lock = threading.Lock()
+
+
+def install_thread_local_stream(name):
+    """
+    Replace sys.<name> with a ThreadLocalStream wrapping it, unless it already is one. The replacement is permanent.
+    :param name: "stdout" or "stderr".
+    :return: The installed ThreadLocalStream.
+    """
+    with _stream_install_lock:
+        stream = getattr(sys, name)
+        if not isinstance(stream, ThreadLocalStream):
+            if stream is not None:
+                # Let Click fix up a misconfigured (e.g. ASCII) stream now, as it would have when writing to it directly;
+                # it won't get another chance once the stream is hidden behind the proxy.
+                stream = click.get_text_stream(name)
+            stream = ThreadLocalStream(stream)
+            setattr(sys, name, stream)
+        return stream
+
+
+@contextlib.contextmanager
+def redirect_thread_output(stdout, stderr):
+    """
+    Redirect sys.stdout and sys.stderr to the given streams for the current thread only. May be nested.
+    :param stdout: The stream to write standard output to.
+    :param stderr: The stream to write standard error to.
+    """
+    proxies = (install_thread_local_stream("stdout"), install_thread_local_stream("stderr"))
+    previous = [getattr(proxy.local, "target", None) for proxy in proxies]
+    proxies[0].local.target = stdout
+    proxies[1].local.target = stderr
+    try:
+        yield
+    finally:
+        for proxy, target in zip(proxies, previous):
+            proxy.local.target = target
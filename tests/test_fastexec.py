@@ -0,0 +1,127 @@
+"""
+Tests that the Commander fast path behaves exactly like Click's main.
+"""
+
+import gc
+import click
+import pytest
+from pycmds import AliasGroup, Commander
+from pycmds.core import fast_path_supported
+
+
+pytestmark = pytest.mark.skipif(not fast_path_supported(), reason="fast path requires Click 8.0 or 8.1")
+
+
+def make_root():
+    @click.group(cls=AliasGroup, context_settings={"help_option_names": ["-h", "--help"]})
+    @click.option("--top", default=1)
+    @click.pass_context
+    def root(ctx, top):
+        ctx.obj.top = top
+
+    @root.group(invoke_without_command=True)
+    def grp():
+        click.echo("grp")
+
+    @grp.command()
+    @click.argument("xs", nargs=-1)
+    @click.option("-v", "--verbose", count=True)
+    @click.pass_obj
+    def leaf(obj, xs, verbose):
+        click.echo("leaf {!r} {} {!r}".format(xs, verbose, obj.get("top")))
+        return len(xs)
+
+    @root.command()
+    @click.option("--n", type=int, required=True)
+    @click.option("--Foo")
+    def num(n, foo):
+        if n < 0:
+            raise click.exceptions.Exit(3)
+        if n == 0:
+            raise click.Abort()
+        return n, foo
+
+    @root.group(chain=True)
+    def ch():
+        pass
+
+    @ch.command()
+    def a():
+        return "a"
+
+    @ch.command()
+    def b():
+        return "b"
+
+    @root.result_callback()
+    def result(value, top):
+        return "result", value
+
+    root.add_alias("num", "nm")
+    return root
+
+
+def run(commander, cmd, **ctx_settings):
+    try:
+        return commander.exec_captured(cmd, **ctx_settings)
+    except Exception as e:
+        return type(e), str(e), e.captured
+
+
+CASES = [
+    "grp leaf 1 2 -vv",
+    "--top 5 grp",
+    "grp",
+    "nm --n 4",
+    "num --n -1",
+    "num --n 0",
+    "num",
+    "num --n x",
+    "num --n 1 extra",
+    "bogus",
+    "grp leaf -x",
+    "",
+    "-h",
+    "num --help",
+    "ch a b a",
+    "--top",
+]
+
+
+@pytest.mark.parametrize("print_click_exceptions", [True, False])
+def test_same_as_main(print_click_exceptions):
+    root = make_root()
+    slow = Commander(root, name="prog", print_click_exceptions=print_click_exceptions)
+    fast = Commander(root, name="prog", print_click_exceptions=print_click_exceptions, fast=True)
+    # Run everything twice so that cached parsers are exercised too.
+    for cmd in CASES * 2:
+        assert run(fast, cmd) == run(slow, cmd), cmd
+
+
+def test_token_normalize_func():
+    root = make_root()
+    slow = Commander(root, name="prog")
+    fast = Commander(root, name="prog", fast=True)
+    for commander in (slow, fast):
+        assert run(commander, "nm --n 1 --foo x", token_normalize_func=str.lower).result == ("result", (1, "x"))
+        assert run(commander, "nm --n 2 --Foo y").result == ("result", (2, "y"))
+        assert "No such option" in run(commander, "nm --n 3 --foo z").stderr
+
+
+def test_lazy_commands_are_not_leaked():
+    class Lazy(click.MultiCommand):
+        def list_commands(self, ctx):
+            return ["dyn"]
+
+        def get_command(self, ctx, name):
+            return click.Command("dyn", params=[click.Option(["--q"])], callback=lambda q: q)
+
+    root = click.Group("root", commands=[Lazy("lazy")])
+    fast = Commander(root, fast=True)
+    for _ in range(50):
+        assert fast.exec("lazy dyn --q 1") == "1"
+        fast.exec("lazy dyn --q 1", token_normalize_func=lambda token: token)
+    gc.collect()
+    parser_cache = fast.fast_executor.parser_cache
+    assert len(parser_cache) == 2
+    assert all(len(parsers) <= fast.fast_executor.MAX_PARSERS_PER_COMMAND for parsers in parser_cache.values())